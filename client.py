@@ -1,8 +1,10 @@
 import asyncio
 import os
+import pathlib
 import re
 import json
 import logging
+import time
 from typing import Any, Optional
 
 from dotenv import load_dotenv
@@ -13,33 +15,62 @@ from mcp_use import MCPAgent, MCPClient
 # ----------------------------- #
 # Logging (quieter by default)  #
 # ----------------------------- #
+_LOG_INIT = False
+
+
 def _setup_logging():
+    global _LOG_INIT
+    if _LOG_INIT:
+        return
+    _LOG_INIT = True
     level_name = os.getenv("MCP_LOG_LEVEL", "WARNING").upper()
     level = getattr(logging, level_name, logging.WARNING)
-    logging.getLogger("mcp_use").setLevel(level)
-    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # check before mutating so repeated setup never walks the logger tree
+    lg = logging.getLogger("mcp_use")
+    if lg.level != level:
+        lg.setLevel(level)
+    lg = logging.getLogger("httpx")
+    if lg.level != logging.WARNING:
+        lg.setLevel(logging.WARNING)
 
 
 # ----------------------------- #
 # Parsing helpers for @tool args
 # ----------------------------- #
-def parse_kv_pairs(s: str) -> dict:
+# Group 2 is the quoted body (already unquoted), group 3 the bareword.
+_KV_RE = re.compile(r'(\w+)=(?:"([^"]*)"|(\S+))')
+_BOOLS = {"true": True, "false": False}
+_TRUTHY = frozenset({"1", "true", "yes", "y"})
+
+
+def parse_kv_pairs(s: str, schema: Optional[dict] = None) -> dict:
     """
     Parse key=value pairs from a tail string.
     Supports key="val with spaces", key=123, key=true/false.
+    With a {arg: json-type} schema, values are cast to the declared type
+    so the server sees correctly typed arguments; otherwise coercion is
+    heuristic as before.
     """
     pairs = {}
-    for m in re.finditer(r'(\w+)=("([^"]*)"|[^\s]+)', s):
+    for m in _KV_RE.finditer(s):
         k = m.group(1)
-        raw = m.group(2)
-        v = raw.strip('"') if raw.startswith('"') and raw.endswith('"') else raw
-        if isinstance(v, str) and v.lower() in ("true", "false"):
-            v = (v.lower() == "true")
+        v = m.group(2)
+        if v is None:
+            v = m.group(3)
+        want = schema.get(k) if schema else None
+        if want == "string":
+            pass
+        elif want == "integer":
+            if v[v.startswith("-"):].isdecimal():
+                v = int(v)
+        elif want == "boolean":
+            v = v.lower() in _TRUTHY
         else:
-            try:
+            b = _BOOLS.get(v.lower())
+            if b is not None:
+                v = b
+            elif v[v.startswith("-"):].isdecimal():
                 v = int(v)
-            except Exception:
-                pass
         pairs[k] = v
     return pairs
 
@@ -47,23 +78,103 @@ def parse_kv_pairs(s: str) -> dict:
 # --------------------------------------------- #
 # Convert MCP CallToolResult into printable text
 # --------------------------------------------- #
+_MAX_RESULT_CHARS = 3000
+_JSON_ENC = json.JSONEncoder(ensure_ascii=False)
+
+try:  # optional: Rust-backed serializer, 3-10x faster on nested payloads
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _roughly_within(data: Any, budget: int) -> bool:
+    """Cheap pre-scan: does the payload's encoded size plausibly fit budget?
+
+    Walks the structure counting string lengths and container overhead,
+    bailing out as soon as the estimate passes budget, so huge payloads
+    cost O(budget) to reject rather than O(payload).
+    """
+    stack = [data]
+    size = 0
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, str):
+            size += len(obj) + 2
+        elif isinstance(obj, dict):
+            size += 2 * len(obj) + 2
+            if size > budget:
+                return False
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            size += len(obj) + 2
+            if size > budget:
+                return False
+            stack.extend(obj)
+        else:
+            size += 8  # numbers, bools, None
+        if size > budget:
+            return False
+    return True
+
+
+def _dumps_bounded(data: Any, limit: int = _MAX_RESULT_CHARS) -> str:
+    """Serialize to JSON but stop once ~limit chars are produced.
+
+    Avoids materializing megabyte payloads only to slice off 3000 chars.
+    """
+    # orjson is the fast path, but it can only serialize whole payloads;
+    # keep it gated behind the size pre-scan so the bound still holds
+    if orjson is not None and _roughly_within(data, limit * 2):
+        try:
+            return orjson.dumps(data).decode("utf-8", "replace")[:limit]
+        except TypeError:
+            pass  # non-orjson-serializable; fall back to stdlib
+    buf = []
+    total = 0
+    for chunk in _JSON_ENC.iterencode(data):
+        buf.append(chunk)
+        total += len(chunk)
+        if total >= limit:
+            break
+    return "".join(buf)[:limit]
+
+
+# Dumper method name per result class ("" = plain object), probed once
+_DUMPERS: dict[type, str] = {}
+
+
 def tool_result_to_str(res: Any) -> str:
     # Already a string
     if isinstance(res, str):
         return res
 
-    # Pydantic-like objects → dict
-    data = None
-    if hasattr(res, "model_dump"):
-        data = res.model_dump()
-    elif hasattr(res, "dict"):
-        data = res.dict()
-    elif hasattr(res, "__dict__"):
+    # Pydantic-like objects → dict (dispatch cached per class)
+    name = _DUMPERS.get(type(res))
+    if name is None:
+        if hasattr(res, "model_dump"):
+            name = "model_dump"
+        elif hasattr(res, "dict"):
+            name = "dict"
+        elif hasattr(res, "__dict__"):
+            name = "__dict__"
+        else:
+            name = ""
+        _DUMPERS[type(res)] = name
+    if name == "__dict__":
         data = res.__dict__
+    elif name:
+        data = getattr(res, name)()
+    else:
+        data = None
 
     # Try to extract text content from MCP-style payloads
     if data:
-        content = data.get("content") or data.get("outputs") or data.get("data")
+        content = data.get("content")
+        if content is None:
+            content = data.get("outputs")
+        if content is None:
+            content = data.get("data")
         if isinstance(content, list):
             texts = []
             for part in content:
@@ -82,43 +193,64 @@ def tool_result_to_str(res: Any) -> str:
 
         # Fallback to compact JSON (trim)
         try:
-            return json.dumps(data, ensure_ascii=False)[:3000]
+            return _dumps_bounded(data)
         except Exception:
             pass
 
     # Last resort
-    return str(res)
+    return str(res)[:_MAX_RESULT_CHARS]
 
 
 # -------------------------------- #
 # Ensure we have an MCP session open
 # -------------------------------- #
+# Winning connect method per client class, so repeat connects skip the probe
+_CONNECT_METHOD_CACHE: dict[type, str] = {}
+_CONNECT_CANDIDATES = ("connect", "connect_all", "open_all_sessions", "ensure_sessions", "initialize")
+
+
+async def _call_connect(client, name: str):
+    """Invoke a previously resolved connect method and return a session."""
+    if name == "create_session":
+        return await client.create_session("weather")
+    r = getattr(client, name)()
+    if asyncio.iscoroutine(r):
+        await r
+    sessions = getattr(client, "sessions", None)
+    if sessions:
+        return next(iter(sessions.values()))
+    return None
+
+
 async def open_weather_session(client: MCPClient):
     """
     Create (or fetch) a session for the FastMCP server named 'weather'.
     Adjust the name if your FastMCP(...) uses a different id.
     """
     # Return first existing session if any
-    if getattr(client, "sessions", None):
-        sess = next(iter(client.sessions.values()), None)
+    sessions = getattr(client, "sessions", None)
+    if sessions:
+        return next(iter(sessions.values()))
+
+    # Known-good method for this client class? Skip the probe.
+    name = _CONNECT_METHOD_CACHE.get(type(client))
+    if name is not None:
+        sess = await _call_connect(client, name)
         if sess:
             return sess
 
     # Create explicitly (preferred)
     if hasattr(client, "create_session"):
+        _CONNECT_METHOD_CACHE[type(client)] = "create_session"
         return await client.create_session("weather")
 
     # Try common alternatives in case of version differences
-    for name in ("connect", "connect_all", "open_all_sessions", "ensure_sessions", "initialize"):
-        fn = getattr(client, name, None)
-        if fn:
-            r = fn()
-            if asyncio.iscoroutine(r):
-                await r
-            if getattr(client, "sessions", None):
-                sess = next(iter(client.sessions.values()), None)
-                if sess:
-                    return sess
+    for name in _CONNECT_CANDIDATES:
+        if getattr(client, name, None):
+            sess = await _call_connect(client, name)
+            if sess:
+                _CONNECT_METHOD_CACHE[type(client)] = name
+                return sess
 
     raise RuntimeError("No MCP sessions available and unable to create one.")
 
@@ -126,6 +258,21 @@ async def open_weather_session(client: MCPClient):
 # --------------------- #
 # Optional: list tools  #
 # --------------------- #
+# Declared argument types per tool ({tool: {arg: json-type}}), filled from
+# the listed tool schemas so parse_kv_pairs can cast client-side.
+_TOOL_SCHEMAS: dict[str, dict[str, str]] = {}
+
+
+def _record_tool_schema(name: str, schema: Any) -> None:
+    props = schema.get("properties") if isinstance(schema, dict) else None
+    if isinstance(props, dict):
+        _TOOL_SCHEMAS[name] = {
+            arg: spec["type"]
+            for arg, spec in props.items()
+            if isinstance(spec, dict) and isinstance(spec.get("type"), str)
+        }
+
+
 async def list_tools_text(session) -> str:
     """
     Try to list available tools from the session (best-effort across versions).
@@ -145,17 +292,78 @@ async def list_tools_text(session) -> str:
     names = []
     for t in tools:
         if isinstance(t, dict):
-            names.append(t.get("name") or t.get("tool") or str(t))
+            n = t.get("name") or t.get("tool")
+            schema = t.get("inputSchema") or t.get("input_schema")
         else:
-            n = getattr(t, "name", None) or getattr(t, "tool", None) or str(t)
-            names.append(n)
+            n = getattr(t, "name", None) or getattr(t, "tool", None)
+            schema = getattr(t, "inputSchema", None) or getattr(t, "input_schema", None)
+        if n and schema is not None:
+            _record_tool_schema(n, schema)
+        names.append(n or str(t))
     names = [n for n in names if n]
     return "Tools: " + (", ".join(names) if names else "get_alerts, ping")
 
 
+# Tool schemas are static per server version; cache the rendered line on
+# disk so startup skips the list_tools round-trip while the cache is fresh.
+_TOOLS_CACHE_PATH = pathlib.Path("~/.cache/mcpagents/tools.json").expanduser()
+_TOOLS_CACHE_MAX_AGE = 24 * 3600.0
+
+
+def _load_cached_tool_line() -> Optional[str]:
+    try:
+        payload = json.loads(_TOOLS_CACHE_PATH.read_text())
+        if not isinstance(payload, dict):
+            return None
+        if time.time() - float(payload.get("ts", 0)) < _TOOLS_CACHE_MAX_AGE:
+            line = payload.get("line")
+            if isinstance(line, str) and line:
+                schemas = payload.get("schemas")
+                if isinstance(schemas, dict):
+                    # validate shape: a corrupt file must not poison lookups
+                    # that parse_kv_pairs does outside any try block
+                    for tool, schema in schemas.items():
+                        if isinstance(tool, str) and isinstance(schema, dict):
+                            _TOOL_SCHEMAS[tool] = {
+                                arg: typ
+                                for arg, typ in schema.items()
+                                if isinstance(arg, str) and isinstance(typ, str)
+                            }
+                return line
+    except (OSError, ValueError, TypeError):
+        pass
+    return None
+
+
+def _store_cached_tool_line(line: str) -> None:
+    try:
+        _TOOLS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _TOOLS_CACHE_PATH.write_text(
+            json.dumps({"line": line, "schemas": _TOOL_SCHEMAS, "ts": time.time()})
+        )
+    except OSError:
+        pass
+
+
 # --------------- #
 # Main chat runner
 # --------------- #
+_CMD_RE = re.compile(r'^@(\w+)\.(\w+)\b(.*)$')
+_EXIT_WORDS = frozenset({"exit", "quit"})
+_HELP_TEMPLATE = """
+{tool_list_line}
+
+Commands:
+  @weather.ping
+  @weather.get_alerts state="CA" [event_filter="heat"] [limit=5] [include_expires=true]
+
+Examples:
+  @weather.get_alerts state="CA"
+  @weather.get_alerts state="CA" event_filter="heat" limit=5 include_expires=true
+  @weather.get_alerts state="WA" limit=8
+"""
+
+
 async def run_memory_chat():
     load_dotenv()
     _setup_logging()
@@ -167,22 +375,19 @@ async def run_memory_chat():
     client = MCPClient.from_config_file(config_file)
     session = await open_weather_session(client)
 
-    # Lightweight model for non-tool chat
-    llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.1, max_tokens=256)
+    # LLM agent is built lazily on the first non-@ command; tool-only
+    # sessions never pay for ChatGroq init or the Groq handshake
+    agent = None
 
-    # Keep planner lean to avoid loops/token burn
-    agent = MCPAgent(
-        llm=llm,
-        client=client,
-        max_steps=1,
-        memory_enabled=False,
-    )
-
-    # Precompute tool listing (best-effort)
-    try:
-        tool_list_line = await list_tools_text(session)
-    except Exception:
-        tool_list_line = "Tools: get_alerts, ping"
+    # Precompute tool listing (best-effort, disk-cached across runs)
+    tool_list_line = _load_cached_tool_line()
+    if tool_list_line is None:
+        try:
+            tool_list_line = await list_tools_text(session)
+            _store_cached_tool_line(tool_list_line)
+        except Exception:
+            tool_list_line = "Tools: get_alerts, ping"
+    help_text = _HELP_TEMPLATE.format(tool_list_line=tool_list_line)
 
     print("\n===== Interactive MCP Chat =====")
     print("Type 'help' for usage examples")
@@ -192,36 +397,29 @@ async def run_memory_chat():
 
     try:
         while True:
-            user_input = input("\nYou: ").strip()
+            # Read in a worker thread so the event loop keeps servicing
+            # background I/O (keep-alives, heartbeats) during think-time
+            user_input = (await asyncio.to_thread(input, "\nYou: ")).strip()
 
             # exits / housekeeping
-            if user_input.lower() in ["exit", "quit"]:
+            lowered = user_input.lower()
+            if lowered in _EXIT_WORDS:
                 print("Ending conversation...")
                 break
-            if user_input.lower() == "clear":
-                agent.clear_conversation_history()
+            if lowered == "clear":
+                if agent is not None:
+                    agent.clear_conversation_history()
                 print("Conversation history cleared.")
                 continue
-            if user_input.lower() == "help":
-                print(f"""
-{tool_list_line}
-
-Commands:
-  @weather.ping
-  @weather.get_alerts state="CA" [event_filter="heat"] [limit=5] [include_expires=true]
-
-Examples:
-  @weather.get_alerts state="CA"
-  @weather.get_alerts state="CA" event_filter="heat" limit=5 include_expires=true
-  @weather.get_alerts state="WA" limit=8
-""")
+            if lowered == "help":
+                print(help_text)
                 continue
 
             # Direct MCP tool path: @server.tool key=val ...
-            m = re.match(r'^@(\w+)\.(\w+)\b(.*)$', user_input)
+            m = _CMD_RE.match(user_input)
             if m:
                 _server, tool, tail = m.groups()
-                args = parse_kv_pairs(tail)
+                args = parse_kv_pairs(tail, _TOOL_SCHEMAS.get(tool))
                 try:
                     result = await session.call_tool(tool, args)
                 except Exception as e:
@@ -231,6 +429,15 @@ Examples:
                 continue
 
             # Otherwise, use the agent (LLM) for normal chat
+            if agent is None:
+                # Lightweight model, lean planner to avoid loops/token burn
+                llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.1, max_tokens=256)
+                agent = MCPAgent(
+                    llm=llm,
+                    client=client,
+                    max_steps=1,
+                    memory_enabled=False,
+                )
             print("\nAssistant: ", end="", flush=True)
             try:
                 response = await agent.run(user_input)
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+ijson = pytest.importorskip("ijson")
+weather = pytest.importorskip("weather")
+
+
+def _stream_features(chunks):
+    async def run():
+        async def gen():
+            for c in chunks:
+                yield c
+
+        items = []
+        async for item in ijson.items(weather._AiterReader(gen()), "features.item"):
+            items.append(item)
+        return items
+
+    return asyncio.run(run())
+
+
+def test_aiter_reader_survives_ijson_read0_probe():
+    # ijson calls read(0) first to sniff bytes vs str and discards the
+    # result; the adapter must not hand it the first real chunk
+    body = [b'{"features": [{"a": 1},', b' {"a": 2}]}']
+    assert _stream_features(body) == [{"a": 1}, {"a": 2}]
+
+
+def test_aiter_reader_single_chunk_body():
+    assert _stream_features([b'{"features": [1, 2, 3]}']) == [1, 2, 3]
@@ -1,8 +1,17 @@
 from __future__ import annotations
+import asyncio
+import atexit
+import time
+from collections import deque
 from typing import Any, Optional
 import httpx
 from mcp.server.fastmcp import FastMCP
 
+try:  # optional: streaming JSON parser for large state payloads
+    import ijson
+except ImportError:
+    ijson = None
+
 # ---------- Init ----------
 mcp = FastMCP("weather")
 
@@ -12,41 +21,146 @@ USER_AGENT = "weather-app/1.0 (contact: you@example.com)"  # add contact per NWS
 MAX_CHARS = 3000  # hard cap to keep LLM payloads small
 MAX_ITEMS = 20    # safety bound on count
 
+# ---------- Caches ----------
+# NWS active alerts only change on the order of minutes; agents often
+# repeat the same query back-to-back, so a short TTL saves the round-trip.
+_TTL = 60.0
+_CACHE_MAX = 128  # FIFO-bounded so memory stays flat
+_ALERTS_CACHE: dict[str, tuple[float, dict]] = {}       # state -> (ts, raw JSON)
+_ALERTS_ORDER: deque[str] = deque()
+_FORMATTED_CACHE: dict[tuple, tuple[float, str]] = {}   # full arg tuple -> (ts, output)
+_FORMATTED_ORDER: deque[tuple] = deque()
+
+def _cache_get(cache: dict, key) -> Any | None:
+    hit = cache.get(key)
+    if hit is None:
+        return None
+    ts, value = hit
+    if time.monotonic() - ts >= _TTL:
+        cache.pop(key, None)  # lazy eviction
+        return None
+    return value
+
+def _cache_put(cache: dict, order: deque, key, value) -> None:
+    # lazy eviction leaves expired keys in the deque, so re-inserts must not
+    # append a duplicate (the O(128) scan is fine on this path)
+    if key not in cache and key not in order:
+        order.append(key)
+        while len(order) > _CACHE_MAX:
+            cache.pop(order.popleft(), None)
+    cache[key] = (time.monotonic(), value)
+
 # ---------- HTTP ----------
-async def make_nws_request(url: str) -> dict[str, Any] | None:
-    headers = {"User-Agent": USER_AGENT, "Accept": "application/geo+json"}
-    async with httpx.AsyncClient() as client:
+_HTTP: httpx.AsyncClient | None = None  # shared keep-alive pool, built lazily
+
+def _get_client() -> httpx.AsyncClient:
+    global _HTTP
+    if _HTTP is None or _HTTP.is_closed:
+        _HTTP = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT, "Accept": "application/geo+json"},
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+        )
+    return _HTTP
+
+@atexit.register
+def _close_client() -> None:
+    if _HTTP is not None and not _HTTP.is_closed:
         try:
-            r = await client.get(url, headers=headers, timeout=30.0)
-            r.raise_for_status()
-            return r.json()
+            asyncio.run(_HTTP.aclose())
         except Exception:
-            return None
+            pass  # interpreter is going down anyway
+
+class _AiterReader:
+    """File-like async adapter so ijson can consume httpx's byte stream."""
+
+    def __init__(self, aiter):
+        self._aiter = aiter
+
+    async def read(self, n: int = -1) -> bytes:
+        if n == 0:
+            # ijson probes read(0) to sniff bytes vs str and discards the
+            # result; handing it a real chunk would lose data
+            return b""
+        try:
+            return await self._aiter.__anext__()
+        except StopAsyncIteration:
+            return b""
+
+async def _fetch_json(
+    url: str,
+    stream_items: str | None,
+    max_stream_items: int | None,
+) -> dict[str, Any]:
+    client = _get_client()
+    if stream_items and ijson is not None:
+        # Parse incrementally and stop early, instead of materializing the
+        # whole payload just to keep the first few items
+        try:
+            items: list[Any] = []
+            async with client.stream("GET", url) as r:
+                r.raise_for_status()
+                async for item in ijson.items(_AiterReader(r.aiter_bytes()), stream_items):
+                    items.append(item)
+                    if max_stream_items is not None and len(items) >= max_stream_items:
+                        break
+            return {"features": items}
+        except httpx.HTTPStatusError:
+            raise  # genuine fetch failure; retrying below would fail the same way
+        except Exception:
+            pass  # streaming parse hiccup: fall back to the full .json() path
+    r = await client.get(url)
+    r.raise_for_status()
+    return r.json()
+
+# Single-flight: concurrent callers for the same fetch share one request
+_INFLIGHT: dict[tuple, asyncio.Future] = {}
+
+async def make_nws_request(
+    url: str,
+    stream_items: str | None = None,
+    max_stream_items: int | None = None,
+) -> dict[str, Any] | None:
+    key = (url, stream_items, max_stream_items)
+    fut = _INFLIGHT.get(key)
+    if fut is not None:
+        return await fut
+    fut = asyncio.get_running_loop().create_future()
+    _INFLIGHT[key] = fut
+    try:
+        try:
+            data = await _fetch_json(url, stream_items, max_stream_items)
+        except Exception:
+            data = None
+        fut.set_result(data)
+        return data
+    finally:
+        _INFLIGHT.pop(key, None)
+        if not fut.done():  # e.g. leader cancelled mid-fetch; release followers
+            fut.cancel()
 
 # ---------- Helpers ----------
+_TRUE_BYTES = frozenset((b"1", b"true", b"yes", b"y"))
+
 def _to_bool(v: Any) -> bool:
-    if isinstance(v, bool):
+    # exact-type checks first: the common cases straight from parse_kv_pairs
+    t = type(v)
+    if t is bool:
         return v
-    if isinstance(v, str):
-        return v.strip().lower() in {"1", "true", "yes", "y"}
+    if t is int:
+        return v != 0
+    if t is str:
+        return v.strip().lower().encode("ascii", "ignore") in _TRUE_BYTES
     return bool(v)
 
 def _to_int(v: Any, default: int) -> int:
+    if type(v) is int:
+        return 1 if v < 1 else (MAX_ITEMS if v > MAX_ITEMS else v)
     try:
         return max(1, min(int(v), MAX_ITEMS))
     except Exception:
         return default
 
-def _brief_alert(feature: dict, include_expires: bool = True) -> str:
-    p = feature.get("properties", {})
-    ev = p.get("event", "?")
-    area = p.get("areaDesc", "?")
-    if len(area) > 120:
-        area = area[:117] + "…"
-    ends = p.get("ends") or p.get("expires") or "N/A"
-    tail = f" (until {ends})" if include_expires else ""
-    return f"• {ev} — {area}{tail}"
-
 # Optional verbose formatter (kept for debugging)
 def format_alert(feature: dict) -> str:
     p = feature.get("properties", {})
@@ -63,15 +177,36 @@ def format_alert(feature: dict) -> str:
 async def get_alerts(
     state: str,
     event_filter: Optional[str] = None,
-    limit: int | str = 5,
-    include_expires: bool | str = True,
+    limit: int = 5,
+    include_expires: bool = True,
 ) -> str:
     """
     Return a compact list of alerts for a US state.
     Args (strings also accepted): state="CA", event_filter="heat", limit=5, include_expires=true
     """
     state = (state or "").upper().strip()
-    data = await make_nws_request(f"{NWS_API_BASE}/alerts/active/area/{state}")
+
+    # coerce + cap
+    n = _to_int(limit, 5)
+    inc = _to_bool(include_expires)
+
+    fmt_key = (state, str(event_filter).lower() if event_filter else None, n, inc)
+    cached = _cache_get(_FORMATTED_CACHE, fmt_key)
+    if cached is not None:
+        return cached
+
+    data = _cache_get(_ALERTS_CACHE, state)
+    if data is None:
+        # With no filter we only ever render n features, so let the streaming
+        # parser stop there; a capped result is partial and must not be cached
+        capped = ijson is not None and not event_filter
+        data = await make_nws_request(
+            f"{NWS_API_BASE}/alerts/active/area/{state}",
+            stream_items="features.item",
+            max_stream_items=n if capped else None,
+        )
+        if data is not None and not capped:
+            _cache_put(_ALERTS_CACHE, _ALERTS_ORDER, state, data)
 
     if not data or "features" not in data:
         return "Unable to fetch alerts or no alerts found."
@@ -79,32 +214,83 @@ async def get_alerts(
     if not feats:
         return "No active alerts for this state."
 
-    # filter
-    if event_filter:
-        q = str(event_filter).lower()
-        feats = [f for f in feats if q in (f.get("properties", {}).get("event", "") or "").lower()]
-        if not feats:
+    # line template chosen once: str.join on a fixed tuple beats building
+    # two f-strings per alert
+    if inc:
+        def _fmt(ev: str, area: str, ends: str) -> str:
+            return "".join(("• ", ev, " — ", area, " (until ", ends, ")"))
+    else:
+        def _fmt(ev: str, area: str, ends: str) -> str:
+            return "".join(("• ", ev, " — ", area))
+
+    # filter + brief in one pass, stopping at the cap so we never format
+    # items the limit would discard
+    q = str(event_filter).lower() if event_filter else None
+    out_lines: list[str] = []
+    for f in feats:
+        p = f.get("properties") or {}
+        ev = p.get("event") or ""
+        if q and q not in ev.lower():
+            continue
+        area = p.get("areaDesc") or "?"
+        if len(area) > 120:
+            area = area[:117] + "…"
+        ends = p.get("ends") or p.get("expires") or "N/A"
+        out_lines.append(_fmt(ev or "?", area, ends))
+        if len(out_lines) >= n:
+            break
+
+    if not out_lines:
+        if event_filter:
             return f"No matching alerts for filter '{event_filter}'."
+        return "No matching alerts."
 
-    # coerce + cap
-    n = _to_int(limit, 5)
-    inc = _to_bool(include_expires)
+    out = "\n".join(out_lines)
+
+    # final guard; with n <= MAX_ITEMS bounded lines this almost never trims
+    if len(out) > MAX_CHARS:
+        out = out[:MAX_CHARS]
+    _cache_put(_FORMATTED_CACHE, _FORMATTED_ORDER, fmt_key, out)
+    return out
+
+_MULTI_SEM = asyncio.Semaphore(10)  # bound NWS fan-out to respect rate limits
+
+@mcp.tool()
+async def get_alerts_multi(
+    states: str,
+    event_filter: Optional[str] = None,
+    limit: int = 5,
+    include_expires: bool = True,
+) -> str:
+    """
+    Return compact alerts for several US states in one call.
+    Args: states="CA,WA,OR" (comma-separated) plus the get_alerts options.
+    """
+    codes = [s.strip().upper() for s in (states or "").split(",") if s.strip()]
+    if not codes:
+        return "No states given."
+
+    async def one(code: str) -> str:
+        async with _MULTI_SEM:
+            return await get_alerts(code, event_filter, limit, include_expires)
 
-    # brief + join
-    lines = [_brief_alert(f, inc) for f in feats[:n]]
-    out = "\n".join(lines) or "No matching alerts."
+    results = await asyncio.gather(*(one(c) for c in codes), return_exceptions=True)
+    sections = []
+    for code, res in zip(codes, results):
+        body = f"Error: {res}" if isinstance(res, BaseException) else res
+        sections.append(f"[{code}]\n{body}")
+    return "\n\n".join(sections)[:MAX_CHARS]
 
-    # final guard
-    return out[:MAX_CHARS]
+_PONG = "🏓 Pong! Weather service is online and ready to provide weather alerts."
 
 @mcp.tool()
 async def ping() -> str:
     """Health check."""
-    return "🏓 Pong! Weather service is online and ready to provide weather alerts."
+    return _PONG
 
 @mcp.resource("echo://{message}")
 def echo_resource(message: str) -> str:
-    return f"Resource echo: {message}"
+    return "Resource echo: " + message[:1024]
 
 # ---------- Run ----------
 if __name__ == "__main__":